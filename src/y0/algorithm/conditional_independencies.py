@@ -2,10 +2,27 @@
 
 """An implementation to get conditional independencies of an ADMG."""
 
-import copy
-from functools import partial
-from itertools import chain, combinations, groupby
-from typing import Callable, Iterable, List, Optional, Sequence, Set, Tuple
+import math
+from collections import defaultdict
+from functools import lru_cache, partial
+from itertools import chain, combinations
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    DefaultDict,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
 import networkx as nx
 from ananke.graphs import ADMG, SG
@@ -14,7 +31,8 @@ from tqdm import tqdm
 from ..dsl import Variable
 from ..graph import NoAnankeError, NxMixedGraph
 from ..struct import DSeparationJudgement
-from ..util.combinatorics import powerset
+
+X = TypeVar("X", bound=Hashable)
 
 __all__ = [
     "are_d_separated",
@@ -35,12 +53,16 @@ def get_conditional_independencies(
     the unique left/right combinations in all valid d-separation.
 
     :param graph: An acyclic directed mixed graph
-    :param policy: Retention policy when more than one conditional independency option exists (see minimal for details)
+    :param policy: Retention policy when more than one conditional independency option exists (see minimal for details).
+        Only used when ``return_all`` is passed to :func:`d_separations`, since otherwise there is exactly one
+        d-separation for each left/right pair and there is nothing to choose from.
     :param kwargs: Other keyword arguments are passed to d_separations
     :return: A set of conditional dependencies
 
     .. seealso:: Original issue https://github.com/y0-causal-inference/y0/issues/24
     """
+    if not kwargs.get("return_all", False):
+        return set(d_separations(graph, **kwargs))
     if policy is None:
         policy = get_topological_policy(graph)
     return minimal(
@@ -66,8 +88,14 @@ def minimal(judgements: Iterable[DSeparationJudgement], policy=None) -> Set[DSep
     """
     if policy is None:
         policy = _len_lex
-    judgements = sorted(judgements, key=_judgement_grouper)
-    return {min(vs, key=policy) for k, vs in groupby(judgements, _judgement_grouper)}
+    # Keep only the best judgement so far for each pair, rather than sorting all of them
+    best: Dict[Tuple[Variable, Variable], Tuple[Any, DSeparationJudgement]] = {}
+    for judgement in judgements:
+        key, value = _judgement_grouper(judgement), policy(judgement)
+        current = best.get(key)
+        if current is None or value < current[0]:
+            best[key] = value, judgement
+    return {judgement for _, judgement in best.values()}
 
 
 def get_topological_policy(
@@ -84,17 +112,14 @@ def get_topological_policy(
     """
     if isinstance(graph, ADMG):
         raise NoAnankeError
-    order = list(graph.topological_sort())
-    return partial(_topological_policy, order=order)
+    rank = {v: i for i, v in enumerate(graph.topological_sort())}
+    return partial(_topological_policy, rank=rank)
 
 
 def _topological_policy(
-    judgement: DSeparationJudgement, order: Sequence[Variable]
+    judgement: DSeparationJudgement, rank: Mapping[Variable, int]
 ) -> Tuple[int, int]:
-    return (
-        len(judgement.conditions),
-        sum((order.index(v) for v in judgement.conditions)),
-    )
+    return len(judgement.conditions), sum(rank[v] for v in judgement.conditions)
 
 
 def _judgement_grouper(judgement: DSeparationJudgement) -> Tuple[Variable, Variable]:
@@ -118,14 +143,25 @@ def disorient(graph: SG) -> nx.Graph:
 def get_moral_links(graph: SG) -> List[Tuple[Variable, Variable]]:
     """Generate links to ensure all co-parents in a graph are linked.
 
+    Each link is only generated once, even if the pair are co-parents of several nodes.
     May generate links that already exist as we assume we are not working on a multi-graph.
 
     :param graph: Graph to process
     :return: An collection of edges to add.
     """
-    parents = [graph.parents([v]) for v in graph.vertices]
-    moral_links = [*chain(*[combinations(nodes, 2) for nodes in parents if len(parents) > 1])]
-    return moral_links
+    parents_of = {v: graph.parents([v]) for v in graph.vertices}
+    # Sorting the parents makes each link canonical, so the set removes duplicates
+    moral_links = {
+        link
+        for parents in parents_of.values()
+        if len(parents) > 1
+        for link in combinations(sorted(parents), 2)
+    }
+    return list(moral_links)
+
+
+#: The most queries memoized by :func:`are_d_separated` for a graph
+_MAX_MEMOIZED_QUERIES = 4096
 
 
 def are_d_separated(
@@ -151,8 +187,7 @@ def are_d_separated(
     """
     if isinstance(graph, ADMG):
         raise NoAnankeError
-    if conditions is None:
-        conditions = set()
+    conditions = frozenset() if conditions is None else frozenset(conditions)
     if not isinstance(a, Variable):
         raise TypeError(f"left argument is not given as a Variable: {type(a)}: {a}")
     if not isinstance(b, Variable):
@@ -160,29 +195,180 @@ def are_d_separated(
     if not all(isinstance(c, Variable) for c in conditions):
         raise TypeError(f"some conditions are not variables: {conditions}")
 
-    condition_names = {c.name for c in conditions}
-    named = {a.name, b.name}.union(condition_names)
+    memo: Dict[Tuple[Variable, Variable, FrozenSet[Variable]], bool]
+    memo = graph._cache.setdefault("d-separation", {})
+    # d-separation is symmetric, so the pair is sorted to share memo entries
+    left, right = sorted([a, b])
+    key = (left, right, conditions)
+    separated = memo.get(key)
+    if separated is None:
+        if len(memo) >= _MAX_MEMOIZED_QUERIES:
+            memo.clear()
+        separated = memo[key] = not _is_d_connected(graph, a, b, conditions=conditions)
+    return DSeparationJudgement.create(left=a, right=b, conditions=conditions, separated=separated)
+
 
-    admg = graph.to_admg()
+def _is_d_connected(
+    graph: NxMixedGraph, a: Variable, b: Variable, *, conditions: FrozenSet[Variable]
+) -> bool:
+    """Check if there is a d-connecting path between a & b given the conditions.
+
+    This uses the Bayes-ball algorithm, which traverses the graph directly rather than
+    building an ancestral, moralized graph. Each state is a node and whether it was entered
+    through an arrowhead (i.e., from a parent or along a bidirected edge). A node passes the
+    ball on as a non-collider if it isn't conditioned on, and as a collider if it is an
+    ancestor of (or in) the conditions.
+
+    :param graph: Graph to test
+    :param a: A node in the graph
+    :param b: A node in the graph
+    :param conditions: A frozen set of graph nodes
+    :return: If a & b are d-connected
+    """
+    if a in conditions or b in conditions:
+        return False
+    parents, children, spouses = graph.directed.pred, graph.directed.succ, graph.undirected.adj
+    # The ancestors of the conditions aren't cached on the graph, since there can be as
+    # many different sets of conditions as there are queries
+    conditions_ancestors = set(conditions)
+    frontier = list(conditions)
+    while frontier:
+        for parent in parents[frontier.pop()]:
+            if parent not in conditions_ancestors:
+                conditions_ancestors.add(parent)
+                frontier.append(parent)
+    visited = {(a, False)}
+    stack = [(a, False)]
+    while stack:
+        node, head = stack.pop()
+        if node == b:
+            return True
+        states: List[Tuple[Variable, bool]] = []
+        # Leaving through a tail makes the node a non-collider
+        if node not in conditions:
+            states.extend((child, True) for child in children[node])
+        # Leaving through an arrowhead makes the node a collider if it was entered through one
+        if (node in conditions_ancestors) if head else (node not in conditions):
+            states.extend((parent, False) for parent in parents[node])
+            states.extend((spouse, True) for spouse in spouses[node])
+        for state in states:
+            if state not in visited:
+                visited.add(state)
+                stack.append(state)
+    return False
+
+
+def _build_evidence_graph(
+    graph: NxMixedGraph, roots: Iterable[Variable]
+) -> Tuple[Set[Variable], Dict[Variable, Set[Variable]]]:
+    """Build the moralized (augmented), disoriented graph over the ancestors of the roots.
+
+    This filters, moralizes, and disorients the graph in a single walk, without building
+    an intermediate subgraph. The walk goes backwards along directed edges from the roots,
+    so it visits exactly the ancestors. Each visited node is linked to its parents and its
+    parents to each other, and its bidirected edges to nodes already visited are used to
+    merge districts. The result does not depend on which of the ancestors are conditioned
+    on, so it can be reused for all conditions within the ancestral set.
+
+    :param graph: The graph to process
+    :param roots: The nodes whose ancestors (including themselves) are kept
+    :return: The kept nodes and the adjacency of the undirected evidence graph, before
+        removal of any conditions
+    """
+    parents, spouses = graph.directed.pred, graph.undirected.adj
+    adjacency: Dict[Variable, Set[Variable]] = {}
+    # The union-find forest of districts among the visited nodes
+    district: Dict[Variable, Variable] = {}
+
+    def _find(node: Variable) -> Variable:
+        while district[node] != node:
+            district[node] = node = district[district[node]]
+        return node
+
+    def _link(nodes: Collection[Variable]) -> None:
+        for node in nodes:
+            adjacency.setdefault(node, set()).update(nodes)
+            adjacency[node].discard(node)
+
+    stack = list(set(roots))
+    adjacency.update((node, set()) for node in stack)
+    while stack:
+        node = stack.pop()
+        district[node] = node
+        # Parents are ancestors too, so they are visited later if they aren't already
+        for parent in parents[node]:
+            if parent not in adjacency:
+                adjacency[parent] = set()
+                stack.append(parent)
+        _link([node, *parents[node]])
+        for spouse in spouses[node]:
+            if spouse in district:
+                district[_find(spouse)] = _find(node)
+
+    # Two nodes are linked if they are connected by a path on which every intermediate node
+    # is a collider. This is the case for all nodes in a district and the district's parents,
+    # which for single node districts are exactly the links made during the walk.
+    members: DefaultDict[Variable, List[Variable]] = defaultdict(list)
+    for node in district:
+        members[_find(node)].append(node)
+    for nodes in members.values():
+        if len(nodes) > 1:
+            _link(set(nodes).union(*(parents[node] for node in nodes)))
+    return set(adjacency), adjacency
+
+
+def _get_path_test(
+    adjacency: Mapping[Variable, Collection[Variable]], nodes: Sequence[Variable]
+) -> Callable[[int, int, int], bool]:
+    """Get a function that checks if two nodes are connected in the evidence graph.
+
+    Nodes are identified by their position in ``nodes``, and a set of nodes is represented
+    as a bitmask in which the bit ``1 << i`` is set for the node with identifier ``i``. This
+    way, checking membership of a condition is a single bit test and no sets of variables
+    are built for each check.
+
+    :param adjacency: The neighbors of each node in the undirected evidence graph before
+        removal of any conditions
+    :param nodes: The nodes of the evidence graph
+    :return: A function from the identifiers of two nodes and a bitmask of conditions to
+        whether there is a path between the nodes that avoids the conditions
+    """
+    return partial(_has_path_mask, _to_adjacency_masks(adjacency, nodes))
 
-    # Filter to ancestors
-    keep = admg.ancestors(named)
-    admg = copy.deepcopy(admg.subgraph(keep))
 
-    # Moralize (link parents of mentioned nodes)
-    for u, v in get_moral_links(admg):  # type: ignore
-        admg.add_udedge(u, v)
+def _to_adjacency_masks(adjacency: Mapping[X, Iterable[X]], nodes: Sequence[X]) -> List[int]:
+    """Get a bitmask of the neighbors of each node, identified by their positions in ``nodes``."""
+    index = {node: 1 << i for i, node in enumerate(nodes)}
+    return [sum(index[neighbor] for neighbor in adjacency[node]) for node in nodes]
 
-    # disorient & remove conditions
-    evidence_graph = disorient(admg)
 
-    keep = set(evidence_graph.nodes) - set(condition_names)
-    evidence_graph = evidence_graph.subgraph(keep)
+def _has_path_mask(adjacency: Sequence[int], source: int, target: int, blocked: int) -> bool:
+    """Check if there is a path between source and target that avoids the blocked nodes.
 
-    # check for path....
-    separated = not nx.has_path(evidence_graph, a.name, b.name)  # If no path, then d-separated!
+    This is a breadth-first search in which the frontier and the visited nodes are
+    bitmasks, so that each step expands the whole frontier with bitwise operations.
 
-    return DSeparationJudgement.create(left=a, right=b, conditions=conditions, separated=separated)
+    :param adjacency: A bitmask of the neighbors of each node (see :func:`_to_adjacency_masks`)
+    :param source: The identifier of the node to start from
+    :param target: The identifier of the node to reach
+    :param blocked: A bitmask of the nodes that are considered removed
+    :return: If the target is reachable from the source
+    """
+    if (blocked >> source) & 1 or (blocked >> target) & 1:
+        return False
+    frontier = 1 << source
+    seen = blocked | frontier
+    while frontier:
+        if (frontier >> target) & 1:
+            return True
+        reached = 0
+        while frontier:
+            lowest = frontier & -frontier
+            reached |= adjacency[lowest.bit_length() - 1]
+            frontier ^= lowest
+        frontier = reached & ~seen
+        seen |= frontier
+    return False
 
 
 def d_separations(
@@ -191,23 +377,227 @@ def d_separations(
     max_conditions: Optional[int] = None,
     verbose: Optional[bool] = False,
     return_all: Optional[bool] = False,
+    n_jobs: Optional[int] = None,
+    batch_size: Optional[int] = None,
 ) -> Iterable[DSeparationJudgement]:
     """Generate d-separations in the provided graph.
 
+    The judgements are memoized on the graph for each ``max_conditions`` and ``return_all``
+    once they have all been generated, so repeating the search on the same graph (e.g.,
+    for :func:`y0.algorithm.falsification.falsifications`) doesn't redo it.
+
     :param graph: Graph to search for d-separations.
     :param max_conditions: Longest set of conditions to investigate
     :param return_all: If false (default) only returns the first d-separation per left/right pair.
     :param verbose: If true, prints extra output with tqdm
+    :param n_jobs: The number of processes used to search left/right pairs in parallel with
+        :mod:`joblib`. If none (default) or 1, the search is done in the current process.
+    :param batch_size: The number of groups of left/right pairs with the same ancestors sent to
+        a process at once when ``n_jobs`` is given. If none, each process gets a handful of
+        evenly sized batches.
     :yields: True d-separation judgements
     :raises NoAnankeError: If an ananke graph is given
     """
     if isinstance(graph, ADMG):
         raise NoAnankeError
-    vertices = set(graph.nodes())
-    for a, b in tqdm(combinations(vertices, 2), disable=not verbose, desc="d-separation check"):
-        for conditions in powerset(vertices - {a, b}, stop=max_conditions):
-            judgement = are_d_separated(graph, a, b, conditions=conditions)
-            if judgement.separated:
-                yield judgement
-                if not return_all:
-                    break
+    key = ("d-separations", max_conditions, bool(return_all))
+    cached = graph._cache.get(key)
+    if cached is not None:
+        yield from cached
+        return
+    judgements = []
+    for judgement in _search(graph, max_conditions, verbose, return_all, n_jobs, batch_size):
+        judgements.append(judgement)
+        yield judgement
+    # Not reached if the caller stops early, so only complete results are memoized
+    graph._cache[key] = tuple(judgements)
+
+
+def _search(
+    graph: NxMixedGraph,
+    max_conditions: Optional[int],
+    verbose: Optional[bool],
+    return_all: Optional[bool],
+    n_jobs: Optional[int],
+    batch_size: Optional[int],
+) -> Iterable[DSeparationJudgement]:
+    """Search d-separations in all groups of left/right pairs, in parallel if requested."""
+    groups = _group_pairs(graph)
+    if n_jobs is None or n_jobs == 1:
+        for _, pairs in tqdm(groups, disable=not verbose, desc="d-separation check"):
+            yield from _search_group(graph, pairs, max_conditions, return_all)
+        return
+
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    if batch_size is None:
+        batch_size = max(1, math.ceil(len(groups) / (4 * effective_n_jobs(n_jobs))))
+    batches = [
+        [pairs for _, pairs in groups[i : i + batch_size]]
+        for i in range(0, len(groups), batch_size)
+    ]
+    # Only the edge data is sent to the workers, not the graph with its cache, so each
+    # worker rebuilds the graph once and reuses it for all of its batches
+    edges = (
+        tuple(graph.nodes()),
+        tuple(graph.directed.edges()),
+        tuple(graph.undirected.edges()),
+    )
+    results = Parallel(n_jobs=n_jobs, backend="loky", return_as="generator")(
+        delayed(_search_batch)(edges, batch, max_conditions, return_all) for batch in batches
+    )
+    for judgements in tqdm(
+        results, total=len(batches), disable=not verbose, desc="d-separation check"
+    ):
+        yield from judgements
+
+
+def _group_pairs(
+    graph: NxMixedGraph,
+) -> List[Tuple[FrozenSet[Variable], List[Tuple[Variable, Variable]]]]:
+    """Group all left/right pairs in the graph by their ancestors (including themselves)."""
+    ancestors = {node: graph.ancestors_inclusive(node) for node in graph.nodes()}
+    rv: DefaultDict[FrozenSet[Variable], List[Tuple[Variable, Variable]]] = defaultdict(list)
+    for a, b in combinations(graph.nodes(), 2):
+        rv[frozenset(ancestors[a] | ancestors[b])].append((a, b))
+    return list(rv.items())
+
+
+_Edges = Tuple[
+    Tuple[Variable, ...],
+    Tuple[Tuple[Variable, Variable], ...],
+    Tuple[Tuple[Variable, Variable], ...],
+]
+
+
+@lru_cache(maxsize=1)
+def _graph_from_edges(edges: _Edges) -> NxMixedGraph:
+    """Rebuild a graph from its nodes, directed edges, and undirected edges."""
+    nodes, directed, undirected = edges
+    return NxMixedGraph.from_edges(nodes=nodes, directed=directed, undirected=undirected)
+
+
+def _search_batch(
+    edges: _Edges,
+    groups: Iterable[List[Tuple[Variable, Variable]]],
+    max_conditions: Optional[int],
+    return_all: Optional[bool],
+) -> List[DSeparationJudgement]:
+    """Search d-separations for a batch of groups of left/right pairs in a worker process.
+
+    :param edges: The nodes, directed edges, and undirected edges of the graph to search
+    :param groups: The groups of left/right pairs that have the same ancestors
+    :param max_conditions: Longest set of conditions to investigate
+    :param return_all: If false, only returns the first d-separation per left/right pair.
+    :return: True d-separation judgements
+    """
+    graph = _graph_from_edges(edges)
+    return [
+        judgement
+        for pairs in groups
+        for judgement in _search_group(graph, pairs, max_conditions, return_all)
+    ]
+
+
+def _search_group(
+    graph: NxMixedGraph,
+    pairs: Collection[Tuple[Variable, Variable]],
+    max_conditions: Optional[int],
+    return_all: Optional[bool],
+) -> Iterable[DSeparationJudgement]:
+    """Search d-separations for left/right pairs that have the same ancestors.
+
+    A minimal separating set (if any exists) only contains ancestors of a & b, so the
+    search can be restricted to them. Since the conditions are then ancestors themselves,
+    the moralized ancestral graph is the same for all of them, and for all pairs in the
+    group. Therefore, the loop is over conditions first, so a set of conditions is only
+    built once and tested against all pairs that still need to be separated.
+
+    :param graph: The graph to search
+    :param pairs: The left/right pairs in the group
+    :param max_conditions: Longest set of conditions to investigate
+    :param return_all: If false, only returns the first d-separation per left/right pair.
+    :yields: True d-separation judgements
+    """
+    endpoints = set(chain.from_iterable(pairs))
+    ancestors, adjacency = _build_evidence_graph(graph, endpoints)
+    # Nodes that are in every pair can never be conditioned on
+    fixed = set.intersection(*(set(pair) for pair in pairs))
+    # Separating sets usually consist of nodes near the pair (e.g., its parents), so
+    # the closest candidates get the lowest bits, which are tried first
+    distances = _get_distances(adjacency, endpoints)
+    candidates = sorted(ancestors - fixed, key=lambda candidate: (distances[candidate], candidate))
+    nodes = [*candidates, *fixed]
+    index = {node: i for i, node in enumerate(nodes)}
+    has_path = _get_path_test(adjacency, nodes)
+    # Pairs and conditions are put in canonical form up front, so judgements can be
+    # made directly instead of re-sorting them with DSeparationJudgement.create
+    pending = [
+        (a, b, index[a], index[b], (1 << index[a]) | (1 << index[b]))
+        for a, b in (sorted(pair) for pair in pairs)
+    ]
+    for size in range(len(candidates) + 1 if max_conditions is None else max_conditions):
+        for mask in _subset_masks(len(candidates), size):
+            remaining = []
+            conditions: Optional[Tuple[Variable, ...]] = None
+            for a, b, source, target, pair_mask in pending:
+                if mask & pair_mask or has_path(source, target, mask):
+                    remaining.append((a, b, source, target, pair_mask))
+                    continue
+                if conditions is None:
+                    # Decoded at most once per mask, then shared by all pairs it separates
+                    conditions = tuple(
+                        sorted(c for i, c in enumerate(candidates) if (mask >> i) & 1)
+                    )
+                yield DSeparationJudgement(True, a, b, conditions)
+                if return_all:
+                    remaining.append((a, b, source, target, pair_mask))
+            if not remaining:
+                return
+            pending = remaining
+
+
+def _get_distances(
+    adjacency: Mapping[Variable, Iterable[Variable]], sources: Iterable[Variable]
+) -> Mapping[Variable, float]:
+    """Get the distance from each node to the closest source in the evidence graph.
+
+    This is a breadth-first search from all sources at once, since the evidence graph
+    is unweighted and doesn't need the priority queue of Dijkstra's algorithm.
+
+    :param adjacency: The neighbors of each node in the undirected evidence graph
+    :param sources: The nodes to measure distances from
+    :return: The number of edges from each node to the closest source, or infinity for
+        nodes that can't be reached from any source
+    """
+    distances: DefaultDict[Variable, float] = defaultdict(lambda: math.inf)
+    frontier = list(set(sources))
+    distance = 0
+    while frontier:
+        for node in frontier:
+            distances[node] = distance
+        distance += 1
+        frontier = list(
+            {
+                neighbor
+                for node in frontier
+                for neighbor in adjacency[node]
+                if neighbor not in distances
+            }
+        )
+    return distances
+
+
+def _subset_masks(n: int, size: int) -> Iterable[int]:
+    """Generate the bitmasks of all subsets of ``range(n)`` with the given size.
+
+    Subsets are generated lazily in lexicographic order, so the search can stop at the
+    first separating set without building all others. Since lower bits are given to
+    closer candidates, subsets of the closest candidates still come first.
+
+    :param n: The number of elements
+    :param size: The size of the subsets
+    :yields: Bitmasks of subsets
+    """
+    for subset in combinations(range(n), size):
+        yield sum(1 << i for i in subset)
@@ -7,7 +7,17 @@ from __future__ import annotations
 import itertools as itt
 import json
 from dataclasses import dataclass, field
-from typing import Any, Collection, Iterable, Mapping, Optional, Tuple, Union
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Hashable,
+    Iterable,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import networkx as nx
 from ananke.graphs import ADMG
@@ -50,12 +60,20 @@ class NxMixedGraph:
 
         # Convert to an Ananke acyclic directed mixed graph
         admg_graph = graph.to_admg()
+
+    .. warning::
+
+        Results of some queries (e.g., d-separation) are cached on the graph. The cache is
+        cleared when the graph is modified with methods like :meth:`add_directed_edge`, but
+        not when :attr:`directed` or :attr:`undirected` are modified directly.
     """
 
     #: A directed graph
     directed: nx.DiGraph = field(default_factory=nx.DiGraph)
     #: A undirected graph
     undirected: nx.Graph = field(default_factory=nx.Graph)
+    #: Cached results of queries on the graph, cleared whenever it is modified
+    _cache: Dict[Hashable, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
 
     def __eq__(self, other: Any) -> bool:
         """Check for equality of nodes, directed edges, and undirected edges."""
@@ -92,12 +110,14 @@ class NxMixedGraph:
 
     def add_node(self, n: Variable) -> None:
         """Add a node."""
+        self._cache.clear()
         n = Variable.norm(n)
         self.directed.add_node(n)
         self.undirected.add_node(n)
 
     def add_directed_edge(self, u: Union[str, Variable], v: Union[str, Variable], **attr) -> None:
         """Add a directed edge from u to v."""
+        self._cache.clear()
         u = Variable.norm(u)
         v = Variable.norm(v)
         self.directed.add_edge(u, v, **attr)
@@ -106,6 +126,7 @@ class NxMixedGraph:
 
     def add_undirected_edge(self, u: Variable, v: Variable, **attr) -> None:
         """Add an undirected edge between u and v."""
+        self._cache.clear()
         u = Variable.norm(u)
         v = Variable.norm(v)
         self.undirected.add_edge(u, v, **attr)
@@ -395,12 +416,24 @@ class NxMixedGraph:
 
     def ancestors_inclusive(self, sources: Union[Variable, Iterable[Variable]]) -> set[Variable]:
         """Ancestors of a set include the set itself."""
-        sources = _ensure_set(sources)
-        return _ancestors_inclusive(self.directed, sources)
+        sources = frozenset(_ensure_set(sources))
+        key = ("ancestors", sources)
+        rv = self._cache.get(key)
+        if rv is None:
+            rv = self._cache[key] = frozenset(_ancestors_inclusive(self.directed, set(sources)))
+        return set(rv)
+
+    @property
+    def topological_order(self) -> Tuple[Variable, ...]:
+        """Get a topological sort from the directed component of the mixed graph, which is cached."""
+        rv = self._cache.get("topological_order")
+        if rv is None:
+            rv = self._cache["topological_order"] = tuple(nx.topological_sort(self.directed))
+        return rv
 
     def topological_sort(self) -> Iterable[Variable]:
         """Get a topological sort from the directed component of the mixed graph."""
-        return nx.topological_sort(self.directed)
+        return iter(self.topological_order)
 
     def connected_components(self) -> Iterable[set[Variable]]:
         """Iterate over the connected components in the undirected graph."""
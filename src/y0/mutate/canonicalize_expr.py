@@ -25,15 +25,22 @@ __all__ = [
 
 
 def canonicalize(
-    expression: Expression, ordering: Optional[Sequence[Union[str, Variable]]] = None
+    expression: Expression,
+    ordering: Union[None, Sequence[Union[str, Variable]], Mapping[str, int]] = None,
 ) -> Expression:
     """Canonicalize an expression that meets the markov condition with respect to the given ordering.
 
     :param expression: An expression to canonicalize
     :param ordering: A toplogical ordering. If none is given, it is assigned by sort order of the variable names.
+        Alternatively, a mapping from the names of the variables to their levels in the ordering can be given,
+        which is used as is. This skips processing the ordering when canonicalizing many expressions with the
+        same one.
     :return: A canonical expression
     """
-    canonicalizer = Canonicalizer(ensure_ordering(expression, ordering=ordering))
+    if isinstance(ordering, Mapping):
+        canonicalizer = Canonicalizer(ordering)
+    else:
+        canonicalizer = Canonicalizer(ensure_ordering(expression, ordering=ordering))
     return canonicalizer.canonicalize(expression)
 
 
@@ -44,16 +51,23 @@ def _sort_probability_key(probability: Probability) -> Tuple[str, ...]:
 class Canonicalizer:
     """A data structure to support application of the canonicalize algorithm."""
 
-    ordering: Sequence[Variable]
+    ordering: Optional[Sequence[Variable]]
     ordering_level: Mapping[str, int]
 
-    def __init__(self, ordering: Sequence[Variable]) -> None:
+    def __init__(self, ordering: Union[Sequence[Variable], Mapping[str, int]]) -> None:
         """Initialize the canonicalizer.
 
-        :param ordering: A topological ordering over the variables appearing in the expression.
+        :param ordering: A topological ordering over the variables appearing in the expression,
+            or a mapping from the name of each of these variables to its level in the ordering.
+            A mapping is used as is, and no ordering is kept in that case.
 
         :raises ValueError: if the ordering has duplicates
         """
+        if isinstance(ordering, Mapping):
+            self.ordering = None
+            self.ordering_level = ordering
+            return
+
         if len(set(ordering)) != len(ordering):
             raise ValueError(f"ordering has duplicates: {ordering}")
 
@@ -2,21 +2,35 @@
 
 """Test getting conditional independencies (and related)."""
 
+import itertools as itt
 import unittest
-from typing import Iterable, Set, Union
+from functools import partial
+from typing import Callable, Iterable, Sequence, Set, Union
+from unittest import mock
 
+import networkx as nx
 from ananke.graphs import ADMG, SG
 
 from y0.algorithm.conditional_independencies import (
+    _build_evidence_graph,
+    _has_path_mask,
+    _to_adjacency_masks,
     are_d_separated,
     get_conditional_independencies,
     get_moral_links,
+    get_topological_policy,
+    minimal,
 )
 from y0.dsl import AA, B, C, D, E, F, G, Variable
 from y0.examples import Example, d_separation_example, examples
 from y0.graph import NxMixedGraph
 from y0.struct import DSeparationJudgement
 
+try:
+    import joblib
+except ImportError:
+    joblib = None
+
 
 class TestDSeparation(unittest.TestCase):
     """Test the d-separation utility."""
@@ -33,6 +47,53 @@ class TestDSeparation(unittest.TestCase):
         self.assertFalse(are_d_separated(graph, D, E, conditions=[AA, B]))
         self.assertFalse(are_d_separated(graph, G, G, conditions=[C]))
 
+    def test_bidirected_colliders(self):
+        """Test d-separation for collider paths that go through bidirected edges."""
+        graph = NxMixedGraph.from_edges(directed=[(AA, C), (B, D)], undirected=[(C, D)])
+        self.assertTrue(are_d_separated(graph, AA, B))
+        self.assertFalse(are_d_separated(graph, AA, B, conditions=[C, D]))
+        self.assertTrue(are_d_separated(graph, AA, B, conditions=[C]))
+
+        graph = NxMixedGraph.from_edges(
+            directed=[(AA, C), (B, D), (C, E), (D, F)], undirected=[(C, D)]
+        )
+        self.assertFalse(are_d_separated(graph, AA, B, conditions=[E, F]))
+        self.assertTrue(are_d_separated(graph, AA, B, conditions=[E]))
+
+    def test_cache(self):
+        """Test that cached d-separations are invalidated when the graph changes."""
+        graph = NxMixedGraph.from_edges(directed=[(AA, B), (C, D)])
+        self.assertTrue(are_d_separated(graph, AA, D))
+        self.assertTrue(are_d_separated(graph, D, AA))
+        graph.add_directed_edge(B, C)
+        self.assertFalse(are_d_separated(graph, AA, D))
+        self.assertFalse(are_d_separated(graph, D, AA))
+        self.assertTrue(are_d_separated(graph, D, AA, conditions=(c for c in [B])))
+
+    def test_cache_search(self):
+        """Test that the search over all pairs is memoized until the graph changes."""
+        graph = NxMixedGraph.from_edges(directed=[(AA, B), (B, C)])
+        judgements = get_conditional_independencies(graph)
+        self.assertEqual({(AA, C, (B,))}, {(j.left, j.right, j.conditions) for j in judgements})
+        with mock.patch(
+            "y0.algorithm.conditional_independencies._search_group",
+            side_effect=AssertionError("the search should be memoized"),
+        ):
+            self.assertEqual(
+                {id(judgement) for judgement in judgements},
+                {id(judgement) for judgement in get_conditional_independencies(graph)},
+            )
+        # A different limit on the conditions is searched again
+        self.assertEqual(set(), get_conditional_independencies(graph, max_conditions=1))
+        graph.add_directed_edge(AA, C)
+        self.assertEqual(set(), get_conditional_independencies(graph))
+
+        # The memo of single queries is bounded
+        for _ in range(2):
+            for condition in [(), (B,)]:
+                are_d_separated(graph, AA, C, conditions=condition)
+        self.assertEqual(2, len(graph._cache["d-separation"]))
+
     def test_examples(self):
         """Check that example conditional independencies are d-separations and that conditions (if present) are required.
 
@@ -106,6 +167,69 @@ class TestDSeparation(unittest.TestCase):
             msg="Moral links not as expected in multi-site case.",
         )
 
+        graph = ADMG(
+            vertices=("a", "b", "c", "d"),
+            di_edges=[("a", "c"), ("b", "c"), ("a", "d"), ("b", "d")],
+        )
+        links = [tuple(sorted(e)) for e in get_moral_links(graph)]
+        self.assertEqual(
+            [("a", "b")],
+            links,
+            msg="Moral links should not be duplicated for parents shared by multiple nodes.",
+        )
+
+    def test_evidence_graph(self):
+        """Test building the moralized (augmented), disoriented ancestral graph."""
+        graph = NxMixedGraph.from_edges(
+            directed=[(AA, C), (B, D), (C, E), (D, F), (G, D)], undirected=[(C, D), (E, G)]
+        )
+        nodes, adjacency = _build_evidence_graph(graph, [E, F])
+        self.assertEqual({AA, B, C, D, E, F, G}, nodes)
+        self.assertEqual(nodes, set(adjacency))
+        # An edge to each parent, moral links between the parents of D, and links between the
+        # district of C & D and its parents. The bidirected edge E <-> G gives a clique of E,
+        # G, and the parent C of E
+        expected = {(AA, C), (B, D), (C, E), (D, F), (D, G), (B, G)}
+        expected |= set(itt.combinations([AA, B, C, D, G], 2))
+        expected |= {(C, G), (E, G)}
+        self.assertEqual(
+            {frozenset(edge) for edge in expected},
+            {frozenset((u, v)) for u, neighbors in adjacency.items() for v in neighbors},
+        )
+
+        nodes, adjacency = _build_evidence_graph(graph, [AA, B])
+        self.assertEqual({AA, B}, nodes)
+        self.assertEqual({AA: set(), B: set()}, adjacency)
+
+    def assert_has_path(self, has_path: Callable[[nx.Graph, Sequence[str]], Callable]) -> None:
+        """Check a search for paths avoiding blocked nodes agrees with :mod:`networkx`.
+
+        :param has_path: A function from the graph and its ordered nodes to a function from
+            the identifiers of the source and target and the bitmask of blocked nodes to
+            if there's a path.
+        """
+        graph = nx.Graph([("a", "b"), ("b", "c"), ("c", "d"), ("a", "e"), ("e", "d"), ("f", "g")])
+        nodes = sorted(graph)
+        index = {node: i for i, node in enumerate(nodes)}
+        func = has_path(graph, nodes)
+        for blocked in [set(), {"b"}, {"e"}, {"b", "e"}, {"c", "e"}]:
+            evidence_graph = graph.subgraph(graph.nodes - blocked)
+            mask = sum(1 << index[node] for node in blocked)
+            for source, target in itt.product(evidence_graph, repeat=2):
+                with self.subTest(source=source, target=target, blocked=blocked):
+                    self.assertEqual(
+                        nx.has_path(evidence_graph, source, target),
+                        func(index[source], index[target], mask),
+                    )
+
+    def test_has_path_mask(self):
+        """Test the bitmask-based search for paths."""
+
+        def _has_path(graph, nodes):
+            return partial(_has_path_mask, _to_adjacency_masks(graph, nodes))
+
+        self.assert_has_path(_has_path)
+
 
 class TestGetConditionalIndependencies(unittest.TestCase):
     """Test getting conditional independencies."""
@@ -205,6 +329,24 @@ class TestGetConditionalIndependencies(unittest.TestCase):
         pairs = [(judgement.left, judgement.right) for judgement in judgements]
         self.assertEqual(len(pairs), len(set(pairs)), "Duplicate left/right pair observed")
 
+    def test_topological_policy(self):
+        """Test that the topological policy prefers fewer conditions, then earlier ones."""
+        graph = NxMixedGraph.from_edges(directed=[(AA, B), (B, C), (C, D), (AA, E), (E, D)])
+        policy = get_topological_policy(graph)
+        judgements = [
+            DSeparationJudgement.create(AA, D, [B, E]),
+            DSeparationJudgement.create(AA, D, [C, E]),
+            DSeparationJudgement.create(AA, D, [C]),
+        ]
+        self.assertEqual(
+            [(C,), (B, E), (C, E)],
+            [judgement.conditions for judgement in sorted(judgements, key=policy)],
+        )
+        self.assertEqual(
+            [(C,)],
+            [judgement.conditions for judgement in minimal(judgements, policy=policy)],
+        )
+
     def test_examples(self):
         """Test getting the conditional independencies from the example graphs."""
         testable = (
@@ -215,3 +357,15 @@ class TestGetConditionalIndependencies(unittest.TestCase):
             with self.subTest(name=example.name):
                 self.maxDiff = None
                 self.assert_example_has_judgements(example)
+
+    @unittest.skipIf(joblib is None, "joblib is not installed")
+    def test_parallel(self):
+        """Test that searching for d-separations in parallel gives the same result."""
+        for example in [d_separation_example, *examples[:5]]:
+            with self.subTest(name=example.name):
+                expected = get_conditional_independencies(example.graph)
+                actual = get_conditional_independencies(example.graph, n_jobs=2, batch_size=3)
+                self.assertEqual(
+                    {(j.left, j.right, j.conditions) for j in expected},
+                    {(j.left, j.right, j.conditions) for j in actual},
+                )
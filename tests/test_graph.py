@@ -191,6 +191,21 @@ class TestGraph(unittest.TestCase):
         self.assertEqual({X, Z}, graph.ancestors_inclusive({Z}))
         self.assertEqual({X}, graph.ancestors_inclusive({X}))
 
+    def test_cache_invalidation(self):
+        """Test that cached ancestors and topological orders are updated when the graph changes."""
+        graph = NxMixedGraph.from_edges(directed=[(X, Y)])
+        self.assertEqual({X, Y}, graph.ancestors_inclusive(Y))
+        self.assertEqual((X, Y), graph.topological_order)
+
+        ancestors = graph.ancestors_inclusive(Y)
+        ancestors.add(Z)
+        self.assertEqual({X, Y}, graph.ancestors_inclusive(Y), msg="cache should not be modified")
+
+        graph.add_directed_edge(Z, X)
+        self.assertEqual({X, Y, Z}, graph.ancestors_inclusive(Y))
+        self.assertEqual((Z, X, Y), graph.topological_order)
+        self.assertEqual([Z, X, Y], list(graph.topological_sort()))
+
     def test_get_c_components(self):
         """Test that get_c_components works correctly."""
         g1 = NxMixedGraph().from_str_edges(directed=[("X", "Y"), ("Z", "X"), ("Z", "Y")])
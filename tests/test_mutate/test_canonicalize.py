@@ -4,24 +4,52 @@
 
 import itertools as itt
 import unittest
-from typing import Sequence
+from functools import lru_cache
+from typing import Mapping, Sequence, Set, Tuple
 
 from y0.dsl import A, B, C, D, Expression, One, P, Product, R, Sum, Variable, W, X, Y, Z
 from y0.mutate import canonical_expr_equal, canonicalize
 
 
+@lru_cache
+def _get_levels(ordering: Tuple[Variable, ...]) -> Mapping[str, int]:
+    """Get the levels for an ordering once, to be shared by all expressions tested with it."""
+    return {variable.name: level for level, variable in enumerate(ordering)}
+
+
 class TestCanonicalize(unittest.TestCase):
     """Tests for the canonicalization of a simplified algorithm."""
 
+    def setUp(self) -> None:
+        """Set up the orderings that have been checked as sequences."""
+        self.checked_orderings: Set[Tuple[Variable, ...]] = set()
+
     def assert_canonicalize(
         self, expected: Expression, expression: Expression, ordering: Sequence[Variable]
     ) -> None:
-        """Check that the expression is canonicalized properly given an ordering."""
+        """Check that the expression is canonicalized properly given an ordering.
+
+        The levels of the ordering are computed once and used for all expressions. The ordering
+        itself is only checked with the first expression it is used for in each test.
+
+        :param expected: The expected canonical expression
+        :param expression: The expression to canonicalize
+        :param ordering: A topological ordering of the variables in the expression
+        """
+        ordering = tuple(ordering)
         with self.subTest(
             expr=str(expression),
             ordering=", ".join(variable.name for variable in ordering),
         ):
-            actual = canonicalize(expression, ordering)
+            if ordering not in self.checked_orderings:
+                self.checked_orderings.add(ordering)
+                actual = canonicalize(expression, ordering)
+                self.assertEqual(
+                    expected,
+                    actual,
+                    msg=f"\nExpected: {str(expression)}\nActual:   {str(actual)} (from ordering)",
+                )
+            actual = canonicalize(expression, _get_levels(ordering))
             self.assertEqual(
                 expected,
                 actual,